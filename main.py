@@ -1,66 +1,262 @@
 import json
 import logging
 import os
+import sqlite3
+import threading
+import time
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
+from functools import partial
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from requests.adapters import HTTPAdapter
 from telegram import Update
 from telegram.ext import (Updater, CommandHandler, MessageHandler, Filters,
                           ConversationHandler, CallbackContext)
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # no orjson wheel for this platform
+    orjson = None
 
 # Set up logging to help debug any issues
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# JSON helpers working on bytes; orjson is much faster but optional
+if orjson is not None:
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+    json_loads = json.loads
+
 # Define states for the conversation
 HOME, WORK, DEPART_HOME, DEPART_WORK = range(4)
 
-# File for storing user settings (note: Railway’s filesystem is ephemeral)
-SETTINGS_FILE = 'settings.json'
-user_settings = {}
+@dataclass(slots=True)
+class UserConfig:
+    """Commute settings for a single chat; fields fill in as setup progresses."""
+    chat_id: int
+    home_lat: float | None = None
+    home_lon: float | None = None
+    home_address: str | None = None
+    work_lat: float | None = None
+    work_lon: float | None = None
+    work_address: str | None = None
+    depart_home: str | None = None
+    depart_work: str | None = None
+
+# Database storing one settings row per chat (note: Railway’s filesystem is ephemeral)
+SETTINGS_DB = 'settings.db'
+LEGACY_SETTINGS_FILE = 'settings.json'  # imported once if the database is empty
+user_settings: dict[int, UserConfig] = {}
+_db = None  # sqlite3 connection, opened by load_settings()
+_db_lock = threading.Lock()
+_dirty_chats: set[int] = set()  # filled by handlers, drained by flush_settings()
+_dirty_lock = threading.Lock()
+SETTINGS_FLUSH_INTERVAL = 5  # seconds
+
+# Process-wide scheduler, created and started on first use by get_scheduler()
+_scheduler = None
+_scheduler_lock = threading.Lock()
 
 # Environment variables – set these in Railway
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')    # Your bot token from BotFather
 OWM_API_KEY = os.environ.get('OWM_API_KEY')          # OpenWeatherMap API key
 MAPQUEST_API_KEY = os.environ.get('MAPQUEST_API_KEY')  # MapQuest API key
 
+WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+ROUTE_URL = "https://www.mapquestapi.com/directions/v2/route"  # MapQuest Directions API
+
+# Shared HTTP session so the weather/route calls reuse keep-alive connections
+# across scheduled jobs instead of paying a TCP+TLS handshake every time.
+# Transient failures and rate limiting are retried with exponential backoff.
+SESSION = requests.Session()
+_retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+               allowed_methods=["GET"])
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=_retry)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+
+# OWM condition id groups that count as rain: 2xx thunderstorm, 3xx drizzle,
+# 5xx rain (6xx snow and 7xx atmosphere are excluded)
+RAINY_GROUPS = frozenset({2, 3, 5})
+
+# Weather at a fixed home/work location rarely changes within half an hour, so
+# successful lookups are reused long enough for the departure job to pick up
+# the result fetched by its preview job 30 minutes earlier.
+WEATHER_TTL = 35 * 60  # seconds
+_weather_cache: dict[tuple, tuple[float, tuple]] = {}
+# Travel times are shared by identical lookups within the same 5-minute bucket
+TRAVEL_BUCKET = 300  # seconds
+_travel_cache: dict[tuple, int] = {}
+
+# Lookups currently on the wire, so concurrent identical calls share one request
+_inflight: dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Worker pool used to fetch weather and travel time concurrently in each job
+_IO_POOL = ThreadPoolExecutor(max_workers=4)
+
+# Commute legs: direction -> (origin, destination, destination label). Origin
+# and destination name the "home"/"work" prefixed fields of UserConfig.
+ROUTE_META = {
+    "to_work": ("home", "work", "Work"),
+    "to_home": ("work", "home", "Home"),
+}
+# Suffix added to a notification when rain is expected
+RAIN_TIPS = {
+    ("to_work", "leave"): " Tip: Wear a waterproof jacket/umbrella.",
+    ("to_work", "preview"): "\nRemember to bring waterproof gear.",
+    ("to_home", "leave"): " Tip: Wear waterproof clothing.",
+    ("to_home", "preview"): "\nRemember your waterproof gear.",
+}
+
+# Notification templates, rendered by build_message()
+LEAVE_TEMPLATE = "Time to go! Expect a {minutes} minute drive to {dest}. Arrival is expected at {arrival}.\n{weather}"
+PREVIEW_TEMPLATE = "Plan to leave by {depart} to {dest}.\nPredicted travel time: {minutes} minutes.\n{weather}"
+WEATHER_TEMPLATE = "Weather: {temp}°C, {desc}, Humidity: {humidity}%, Chance of rain: {rain}%."
+WEATHER_UNAVAILABLE = {
+    "leave": " Weather data unavailable.",
+    "preview": "\nWeather data unavailable.",
+}
+
 # ------------------ Helper Functions ------------------
-def save_settings():
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(user_settings, f)
+def save_settings(chat_ids):
+    """Writes the settings rows of the given chats in a single transaction."""
+    rows = [(chat_id, json_dumps(asdict(user_settings[chat_id])))
+            for chat_id in chat_ids if chat_id in user_settings]
+    with _db_lock, _db:
+        _db.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)", rows)
+
+def get_scheduler():
+    """Returns the shared scheduler, creating and starting it on first use.
+
+    Nothing is started until there are settings to flush or notifications to
+    schedule, so an idle bot never spins up the scheduler thread.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            # Jobs are I/O bound (OWM, MapQuest, Telegram), so give them a larger
+            # thread pool and let a briefly stalled host still deliver late runs.
+            # Runs missed while the process was paused collapse into one.
+            _scheduler = BackgroundScheduler(
+                executors={'default': {'type': 'threadpool', 'max_workers': 20}},
+                job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 600})
+            _scheduler.start()
+            _scheduler.add_job(flush_settings, 'interval', seconds=SETTINGS_FLUSH_INTERVAL,
+                               id='flush_settings')
+    return _scheduler
+
+def mark_settings_dirty(chat_id: int):
+    """Flags a chat's settings for the next periodic flush instead of writing inline."""
+    with _dirty_lock:
+        _dirty_chats.add(chat_id)
+    get_scheduler()
+
+def flush_settings():
+    """Scheduler job that persists the settings of chats changed since the last run."""
+    global _dirty_chats
+    with _dirty_lock:
+        chat_ids, _dirty_chats = _dirty_chats, set()
+    if not chat_ids:
+        return
+    try:
+        save_settings(chat_ids)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to save settings: {e}")
+        # Keep the changes pending so the next flush retries them
+        with _dirty_lock:
+            _dirty_chats |= chat_ids
+
+def _import_legacy_settings():
+    """Copies settings from the JSON file used before the sqlite database."""
+    try:
+        with open(LEGACY_SETTINGS_FILE, 'rb') as f:
+            data = json_loads(f.read())
+    except FileNotFoundError:
+        return
+    # The oldest files hold a single user's settings at the top level
+    if "chat_id" in data:
+        data = {str(data["chat_id"]): data}
+    user_settings.update({int(chat_id): UserConfig(**cfg) for chat_id, cfg in data.items()})
+    save_settings(user_settings)
+    logger.info(f"Imported {len(user_settings)} users from {LEGACY_SETTINGS_FILE}")
 
 def load_settings():
-    global user_settings
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            user_settings = json.load(f)
-    else:
-        user_settings = {}
+    global user_settings, _db
+    _db = sqlite3.connect(SETTINGS_DB, check_same_thread=False)
+    _db.execute("PRAGMA journal_mode=WAL")
+    _db.execute("CREATE TABLE IF NOT EXISTS settings(chat_id INTEGER PRIMARY KEY, data BLOB)")
+    rows = _db.execute("SELECT chat_id, data FROM settings").fetchall()
+    user_settings = {chat_id: UserConfig(**json_loads(data)) for chat_id, data in rows}
+    if not user_settings:
+        _import_legacy_settings()
 
-def get_weather(lat: float, lon: float, retries=3):
-    url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OWM_API_KEY}&units=metric"
-    attempt = 0
-    while attempt < retries:
-        try:
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            if response.status_code == 200:
-                temperature = data["main"]["temp"]
-                humidity = data["main"]["humidity"]
-                weather_desc = data["weather"][0]["description"]
-                chance_of_rain = 100 if "rain" in weather_desc.lower() else 0
-                return temperature, humidity, chance_of_rain, weather_desc
-            else:
-                attempt += 1
-        except Exception as e:
-            logger.error(f"Weather API error: {e}")
-            attempt += 1
+def _single_flight(key: tuple, fetch):
+    """Runs ``fetch()`` once for all concurrent callers using the same key."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _inflight[key] = Future()
+    if not is_owner:
+        return future.result()
+    try:
+        result = fetch()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+def get_weather(lat: float, lon: float):
+    key = (round(lat, 3), round(lon, 3))
+    cached = _weather_cache.get(key)
+    if cached and time.monotonic() - cached[0] < WEATHER_TTL:
+        return cached[1]
+    return _single_flight(("weather",) + key, partial(_fetch_weather, lat, lon, key))
+
+def _fetch_weather(lat: float, lon: float, key: tuple):
+    # ~11 m precision is plenty for current weather
+    params = {"lat": f"{lat:.4f}", "lon": f"{lon:.4f}", "appid": OWM_API_KEY, "units": "metric"}
+    try:
+        response = SESSION.get(WEATHER_URL, params=params, timeout=10)
+        # Don't bother parsing error bodies
+        if response.status_code != 200:
+            logger.error(f"Weather API returned HTTP {response.status_code}")
+            return None, None, None, "Unable to fetch weather data"
+        data = json_loads(response.content)
+        temperature = data["main"]["temp"]
+        humidity = data["main"]["humidity"]
+        weather_desc = data["weather"][0]["description"]
+        chance_of_rain = 100 if data["weather"][0]["id"] // 100 in RAINY_GROUPS else 0
+        result = (temperature, humidity, chance_of_rain, weather_desc)
+        _weather_cache[key] = (time.monotonic(), result)
+        return result
+    except Exception as e:
+        logger.error(f"Weather API error: {e}")
     return None, None, None, "Unable to fetch weather data"
 
-def get_travel_time(origin: str, destination: str, retries=3):
-    # Using MapQuest Directions API
-    base_url = "https://www.mapquestapi.com/directions/v2/route"
+def get_travel_time(origin: str, destination: str):
+    bucket = int(time.time()) // TRAVEL_BUCKET
+    key = (origin, destination, bucket)
+    if key in _travel_cache:
+        return _travel_cache[key]
+    return _single_flight(("route",) + key, partial(_fetch_travel_time, origin, destination, key))
+
+def _fetch_travel_time(origin: str, destination: str, key: tuple):
+    bucket = key[2]
     params = {
         "key": MAPQUEST_API_KEY,
         "from": origin,
@@ -69,110 +265,100 @@ def get_travel_time(origin: str, destination: str, retries=3):
         "ambiguities": "ignore",
         "routeType": "fastest"
     }
-    attempt = 0
-    while attempt < retries:
-        try:
-            response = requests.get(base_url, params=params, timeout=10)
-            data = response.json()
-            if data.get("info", {}).get("statuscode") == 0:
-                # Travel time is returned in seconds; convert to minutes.
-                travel_time_seconds = data["route"]["time"]
-                minutes = int(travel_time_seconds / 60)
-                return minutes
-            else:
-                attempt += 1
-        except Exception as e:
-            logger.error(f"MapQuest API error: {e}")
-            attempt += 1
+    try:
+        response = SESSION.get(ROUTE_URL, params=params, timeout=10)
+        if response.status_code != 200:
+            logger.error(f"MapQuest API returned HTTP {response.status_code}")
+            return None
+        data = json_loads(response.content)
+        if data.get("info", {}).get("statuscode") == 0:
+            # Travel time is returned in seconds; convert to minutes.
+            travel_time_seconds = data["route"]["time"]
+            minutes = int(travel_time_seconds / 60)
+            # Entries from earlier buckets can never be hit again
+            for old_key in list(_travel_cache):
+                if old_key[2] != bucket:
+                    _travel_cache.pop(old_key, None)
+            _travel_cache[key] = minutes
+            return minutes
+    except Exception as e:
+        logger.error(f"MapQuest API error: {e}")
     return None
 
-def schedule_notifications(context: CallbackContext):
-    """Schedules daily notifications for both Home→Work and Work→Home journeys."""
-    scheduler = BackgroundScheduler()
+def build_message(kind: str, direction: str, minutes, weather, arrival=None, depart=None) -> str:
+    """Renders a "leave" or "preview" notification for one commute leg."""
+    if weather[0] is not None:
+        weather_text = "".join([
+            WEATHER_TEMPLATE.format(temp=weather[0], desc=weather[3], humidity=weather[1], rain=weather[2]),
+            RAIN_TIPS[direction, kind] if weather[2] > 0 else "",
+        ])
+    else:
+        weather_text = WEATHER_UNAVAILABLE[kind]
+    template = LEAVE_TEMPLATE if kind == "leave" else PREVIEW_TEMPLATE
+    return template.format(minutes=minutes, dest=ROUTE_META[direction][2], arrival=arrival,
+                           depart=depart, weather=weather_text)
+
+def _build_and_send(dispatcher, cfg: UserConfig, direction: str, kind: str):
+    """Fetches weather and travel time for one commute leg and notifies the user.
+
+    ``kind`` is either "leave" (sent at departure time) or "preview" (sent 30
+    minutes before departure). The message is sent from the dispatcher's worker
+    pool so the scheduler thread is freed without waiting on Telegram.
+    """
     now = datetime.now()
+    origin, dest, dest_label = ROUTE_META[direction]
+    f_w = _IO_POOL.submit(get_weather, getattr(cfg, f"{origin}_lat"), getattr(cfg, f"{origin}_lon"))
+    f_t = _IO_POOL.submit(get_travel_time, getattr(cfg, f"{origin}_address"), getattr(cfg, f"{dest}_address"))
+    minutes = f_t.result()
+    if minutes is None and kind == "leave":
+        # Without a route the departure message has nothing useful to say, so
+        # don't hold it back waiting on the weather call as well.
+        f_w.cancel()
+        dispatcher.run_async(dispatcher.bot.send_message, chat_id=cfg.chat_id,
+                             text=f"Time to go! Unable to compute your route to {dest_label}, please check traffic manually.")
+        return
+    weather = f_w.result()
+
+    if kind == "leave":
+        arrival = (now + timedelta(minutes=minutes)).strftime("%H:%M") if minutes else "unknown"
+        message = build_message(kind, direction, minutes, weather, arrival=arrival)
+    else:
+        message = build_message(kind, direction, minutes, weather, depart=getattr(cfg, f"depart_{origin}"))
+    dispatcher.run_async(dispatcher.bot.send_message, chat_id=cfg.chat_id, text=message)
+
+def schedule_notifications(dispatcher, cfg: UserConfig):
+    """Schedules daily notifications for both Home→Work and Work→Home journeys.
 
-    # Helper to add a job at a scheduled time
-    def add_job(dept_time_str, job_func, job_name):
+    Jobs use cron triggers so they repeat every day; re-running setup replaces
+    the user's existing jobs instead of stacking new ones. Job ids are prefixed
+    with the chat id so every user gets an independent set of jobs.
+    """
+    # Helper to add a daily job at a scheduled time
+    def add_job(hour, minute, direction, kind, job_name):
+        job_name = f"{cfg.chat_id}_{job_name}"
+        get_scheduler().add_job(_build_and_send, CronTrigger(hour=hour, minute=minute),
+                                args=[dispatcher, cfg, direction, kind], id=job_name, replace_existing=True)
+        logger.info(f"Scheduled {job_name} daily at {hour:02d}:{minute:02d}")
+
+    # Helper to schedule a departure job plus its preview 30 minutes earlier
+    def add_departure_jobs(dept_time_str, direction, job_name):
+        # Times are validated with strptime when entered, so a split is enough here
         try:
-            dept_time = datetime.strptime(dept_time_str, "%H:%M").time()
+            hour, minute = map(int, dept_time_str.split(":"))
         except ValueError:
             logger.error("Invalid time format in settings.")
             return
-
-        scheduled_time = datetime.combine(now.date(), dept_time)
-        # If the scheduled time already passed today, schedule for tomorrow
-        if scheduled_time < now:
-            scheduled_time += timedelta(days=1)
-        scheduler.add_job(job_func, 'date', run_date=scheduled_time, id=job_name)
-        logger.info(f"Scheduled {job_name} for {scheduled_time}")
-
-    # Job functions for notifications
-    def job_departure_home():
-        departure_ts = int(datetime.now().timestamp())
-        minutes = get_travel_time(user_settings["home_address"], user_settings["work_address"])
-        arrival_time = (datetime.now() + timedelta(minutes=minutes)).strftime("%H:%M") if minutes else "unknown"
-        weather = get_weather(user_settings["home_lat"], user_settings["home_lon"])
-        message = f"Time to go! Expect a {minutes} minute drive to Work. Arrival is expected at {arrival_time}.\n"
-        if weather[0] is not None:
-            message += f"Weather: {weather[0]}°C, {weather[3]}, Humidity: {weather[1]}%, Chance of rain: {weather[2]}%."
-            if weather[2] > 0:
-                message += " Tip: Wear a waterproof jacket/umbrella."
-        else:
-            message += " Weather data unavailable."
-        context.bot.send_message(chat_id=user_settings["chat_id"], text=message)
-
-    def job_pre_departure_home():
-        # Preview message sent 30 minutes before departure
-        minutes = get_travel_time(user_settings["home_address"], user_settings["work_address"])
-        weather = get_weather(user_settings["home_lat"], user_settings["home_lon"])
-        message = f"Plan to leave by {user_settings['depart_home']} to Work.\nPredicted travel time: {minutes} minutes.\n"
-        if weather[0] is not None:
-            message += f"Weather: {weather[0]}°C, {weather[3]}, Humidity: {weather[1]}%, Chance of rain: {weather[2]}%."
-            if weather[2] > 0:
-                message += "\nRemember to bring waterproof gear."
-        else:
-            message += "\nWeather data unavailable."
-        context.bot.send_message(chat_id=user_settings["chat_id"], text=message)
-
-    def job_departure_work():
-        minutes = get_travel_time(user_settings["work_address"], user_settings["home_address"])
-        arrival_time = (datetime.now() + timedelta(minutes=minutes)).strftime("%H:%M") if minutes else "unknown"
-        weather = get_weather(user_settings["work_lat"], user_settings["work_lon"])
-        message = f"Time to go! Expect a {minutes} minute drive to Home. Arrival is expected at {arrival_time}.\n"
-        if weather[0] is not None:
-            message += f"Weather: {weather[0]}°C, {weather[3]}, Humidity: {weather[1]}%, Chance of rain: {weather[2]}%."
-            if weather[2] > 0:
-                message += " Tip: Wear waterproof clothing."
-        else:
-            message += " Weather data unavailable."
-        context.bot.send_message(chat_id=user_settings["chat_id"], text=message)
-
-    def job_pre_departure_work():
-        minutes = get_travel_time(user_settings["work_address"], user_settings["home_address"])
-        weather = get_weather(user_settings["work_lat"], user_settings["work_lon"])
-        message = f"Plan to leave by {user_settings['depart_work']} to Home.\nPredicted travel time: {minutes} minutes.\n"
-        if weather[0] is not None:
-            message += f"Weather: {weather[0]}°C, {weather[3]}, Humidity: {weather[1]}%, Chance of rain: {weather[2]}%."
-            if weather[2] > 0:
-                message += "\nRemember your waterproof gear."
-        else:
-            message += "\nWeather data unavailable."
-        context.bot.send_message(chat_id=user_settings["chat_id"], text=message)
+        pre_hour, pre_minute = divmod((hour * 60 + minute - 30) % (24 * 60), 60)
+        add_job(hour, minute, direction, "leave", f"{job_name}_departure")
+        add_job(pre_hour, pre_minute, direction, "preview", f"{job_name}_pre_departure")
 
     # Schedule jobs for Home→Work if set
-    if "depart_home" in user_settings:
-        add_job(user_settings['depart_home'], job_departure_home, 'home_departure')
-        # Calculate preview time (30 minutes before departure)
-        pre_home_time = (datetime.strptime(user_settings['depart_home'], "%H:%M") - timedelta(minutes=30)).time().strftime("%H:%M")
-        add_job(pre_home_time, job_pre_departure_home, 'home_pre_departure')
+    if cfg.depart_home:
+        add_departure_jobs(cfg.depart_home, "to_work", 'home')
 
     # Schedule jobs for Work→Home if set
-    if "depart_work" in user_settings:
-        add_job(user_settings['depart_work'], job_departure_work, 'work_departure')
-        pre_work_time = (datetime.strptime(user_settings['depart_work'], "%H:%M") - timedelta(minutes=30)).time().strftime("%H:%M")
-        add_job(pre_work_time, job_pre_departure_work, 'work_pre_departure')
-
-    scheduler.start()
+    if cfg.depart_work:
+        add_departure_jobs(cfg.depart_work, "to_home", 'work')
 
 # ------------------ Telegram Bot Handlers ------------------
 def start(update: Update, context: CallbackContext) -> int:
@@ -184,12 +370,13 @@ def start(update: Update, context: CallbackContext) -> int:
 def home_location(update: Update, context: CallbackContext) -> int:
     if update.message.location:
         home_loc = update.message.location
-        user_settings["home_lat"] = home_loc.latitude
-        user_settings["home_lon"] = home_loc.longitude
-        user_settings["home_address"] = f"{home_loc.latitude},{home_loc.longitude}"
-        user_settings["chat_id"] = update.message.chat_id
+        chat_id = update.message.chat_id
+        cfg = user_settings.setdefault(chat_id, UserConfig(chat_id=chat_id))
+        cfg.home_lat = home_loc.latitude
+        cfg.home_lon = home_loc.longitude
+        cfg.home_address = f"{home_loc.latitude},{home_loc.longitude}"
         update.message.reply_text("Home location saved. Now, please share your **Work** location.", parse_mode="Markdown")
-        save_settings()
+        mark_settings_dirty(chat_id)
         return WORK
     else:
         update.message.reply_text("Please share your location using Telegram’s location feature.")
@@ -198,11 +385,13 @@ def home_location(update: Update, context: CallbackContext) -> int:
 def work_location(update: Update, context: CallbackContext) -> int:
     if update.message.location:
         work_loc = update.message.location
-        user_settings["work_lat"] = work_loc.latitude
-        user_settings["work_lon"] = work_loc.longitude
-        user_settings["work_address"] = f"{work_loc.latitude},{work_loc.longitude}"
+        chat_id = update.message.chat_id
+        cfg = user_settings.setdefault(chat_id, UserConfig(chat_id=chat_id))
+        cfg.work_lat = work_loc.latitude
+        cfg.work_lon = work_loc.longitude
+        cfg.work_address = f"{work_loc.latitude},{work_loc.longitude}"
         update.message.reply_text("Work location saved. Now please send your departure time from Home (HH:MM).")
-        save_settings()
+        mark_settings_dirty(chat_id)
         return DEPART_HOME
     else:
         update.message.reply_text("Please share your location using Telegram’s location feature.")
@@ -212,9 +401,11 @@ def depart_home_time(update: Update, context: CallbackContext) -> int:
     time_text = update.message.text
     try:
         datetime.strptime(time_text, "%H:%M")
-        user_settings["depart_home"] = time_text
+        chat_id = update.message.chat_id
+        cfg = user_settings.setdefault(chat_id, UserConfig(chat_id=chat_id))
+        cfg.depart_home = time_text
         update.message.reply_text("Home departure time saved. Now send your departure time from Work (HH:MM).")
-        save_settings()
+        mark_settings_dirty(chat_id)
         return DEPART_WORK
     except ValueError:
         update.message.reply_text("Invalid time format. Please use HH:MM (e.g., 08:30).")
@@ -224,10 +415,12 @@ def depart_work_time(update: Update, context: CallbackContext) -> int:
     time_text = update.message.text
     try:
         datetime.strptime(time_text, "%H:%M")
-        user_settings["depart_work"] = time_text
+        chat_id = update.message.chat_id
+        cfg = user_settings.setdefault(chat_id, UserConfig(chat_id=chat_id))
+        cfg.depart_work = time_text
         update.message.reply_text("Work departure time saved! Your notifications will be scheduled automatically.")
-        save_settings()
-        schedule_notifications(context)
+        mark_settings_dirty(chat_id)
+        schedule_notifications(context.dispatcher, cfg)
         return ConversationHandler.END
     except ValueError:
         update.message.reply_text("Invalid time format. Please use HH:MM (e.g., 18:00).")
@@ -240,9 +433,14 @@ def cancel(update: Update, context: CallbackContext) -> int:
 # ------------------ Main Function ------------------
 def main():
     load_settings()
-    updater = Updater(TELEGRAM_TOKEN, use_context=True)
+    updater = Updater(TELEGRAM_TOKEN, use_context=True, workers=8)
     dp = updater.dispatcher
 
+    # Restore daily jobs for every user who finished setup before a restart
+    for cfg in user_settings.values():
+        if cfg.depart_work:
+            schedule_notifications(dp, cfg)
+
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', start)],
         states={
@@ -256,6 +454,7 @@ def main():
     dp.add_handler(conv_handler)
     updater.start_polling()
     updater.idle()
+    flush_settings()
 
 if __name__ == '__main__':
     main()